@@ -1,284 +1,679 @@
-from PIL import Image, ImageTk
+from functools import lru_cache
+from random import getrandbits
+import threading
+import time
+import numpy as np
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from tkinter import filedialog, colorchooser, messagebox
+from tkinter import PhotoImage, filedialog, colorchooser, messagebox
 
 MEMORY_SIZE = 4096
+STACK_SIZE = 16
+
+# Emulation speed, 10 instructions per 60 Hz frame
+CYCLES_PER_FRAME = 10
+FRAME_TIME = 1 / 60
+
+# The display is packed one 64-bit word per row, pixel x lives in bit 63 - x
+ROW_MASK = 0xFFFFFFFFFFFFFFFF
+
+# Disassembly of the multiplexed families, keyed by n (0x8xxx) or kk (0xExxx, 0xFxxx)
+_DIS_8 = {
+    0x0: "LD V{x:X}, V{y:X}",
+    0x1: "OR V{x:X}, V{y:X}",
+    0x2: "AND V{x:X}, V{y:X}",
+    0x3: "XOR V{x:X}, V{y:X}",
+    0x4: "ADD V{x:X}, V{y:X}",
+    0x5: "SUB V{x:X}, V{y:X}",
+    0x6: "SHR V{x:X}",
+    0x7: "SUBN V{x:X}, V{y:X}",
+    0xE: "SHL V{x:X}",
+}
+_DIS_E = {
+    0x9E: "SKP V{x:X}",
+    0xA1: "SKNP V{x:X}",
+}
+_DIS_F = {
+    0x07: "LD V{x:X}, DT",
+    0x0A: "LD V{x:X}, K",
+    0x15: "LD DT, V{x:X}",
+    0x18: "LD ST, V{x:X}",
+    0x1E: "ADD I, V{x:X}",
+    0x29: "LD F, V{x:X}",
+    0x33: "LD B, V{x:X}",
+    0x55: "LD [I], V0-V{x:X}",
+    0x65: "LD V0-V{x:X}, [I]",
+}
+
+# One disassembler per opcode family (opcode >> 12), None means unknown
+def _dis_0(opcode, x, y, n, kk, nnn):
+    if opcode == 0x00E0:
+        return "CLS"
+    if opcode == 0x00EE:
+        return "RET"
+    return None
+
+def _dis_1(opcode, x, y, n, kk, nnn):
+    return f"JP {nnn:03X}"
+
+def _dis_2(opcode, x, y, n, kk, nnn):
+    return f"CALL {nnn:03X}"
+
+def _dis_3(opcode, x, y, n, kk, nnn):
+    return f"SE V{x:X}, {kk:02X}"
+
+def _dis_4(opcode, x, y, n, kk, nnn):
+    return f"SNE V{x:X}, {kk:02X}"
+
+def _dis_5(opcode, x, y, n, kk, nnn):
+    return f"SE V{x:X}, V{y:X}" if n == 0 else None
+
+def _dis_6(opcode, x, y, n, kk, nnn):
+    return f"LD V{x:X}, {kk:02X}"
+
+def _dis_7(opcode, x, y, n, kk, nnn):
+    return f"ADD V{x:X}, {kk:02X}"
+
+def _dis_8(opcode, x, y, n, kk, nnn):
+    fmt = _DIS_8.get(n)
+    return fmt.format(x=x, y=y) if fmt else None
+
+def _dis_9(opcode, x, y, n, kk, nnn):
+    return f"SNE V{x:X}, V{y:X}" if n == 0 else None
+
+def _dis_A(opcode, x, y, n, kk, nnn):
+    return f"LD I, {nnn:03X}"
 
+def _dis_B(opcode, x, y, n, kk, nnn):
+    return f"JP V0, {nnn:03X}"
+
+def _dis_C(opcode, x, y, n, kk, nnn):
+    return f"RND V{x:X}, {kk:02X}"
+
+def _dis_D(opcode, x, y, n, kk, nnn):
+    return f"DRW V{x:X}, V{y:X}, {n:X}"
+
+def _dis_E(opcode, x, y, n, kk, nnn):
+    fmt = _DIS_E.get(kk)
+    return fmt.format(x=x) if fmt else None
+
+def _dis_F(opcode, x, y, n, kk, nnn):
+    fmt = _DIS_F.get(kk)
+    return fmt.format(x=x) if fmt else None
+
+_DISASSEMBLERS = (
+    _dis_0, _dis_1, _dis_2, _dis_3, _dis_4, _dis_5, _dis_6, _dis_7,
+    _dis_8, _dis_9, _dis_A, _dis_B, _dis_C, _dis_D, _dis_E, _dis_F,
+)
+
+@lru_cache(maxsize=65536)
 def disassemble(opcode: int) -> str:
     nnn = opcode & 0x0FFF
     n   = opcode & 0x000F
     x   = (opcode & 0x0F00) >> 8
     y   = (opcode & 0x00F0) >> 4
     kk  = opcode & 0x00FF
+    asm = _DISASSEMBLERS[opcode >> 12](opcode, x, y, n, kk, nnn)
+    return asm if asm is not None else f"UNKNOWN {opcode:04X}"
+
+# JIT-compiled interpreter core, used instead of Chip8.cycle when numba is installed
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Slots of the register array shared between Chip8.run and the JIT kernel
+REG_PC = 0
+REG_I = 1
+REG_SP = 2
+REG_DT = 3
+REG_ST = 4
+REG_DIRTY = 5
+
+def _cycle(memory, V, display, keys, stack, regs):
+    pc = regs[REG_PC]
+    I = regs[REG_I]
+    sp = regs[REG_SP]
+
+    # Fetch
+    opcode = (int(memory[pc]) << 8) | int(memory[pc + 1])
+    pc += 2
+
+    # Decode
+    nnn = opcode & 0x0FFF
+    n = opcode & 0x000F
+    x = (opcode & 0x0F00) >> 8
+    y = (opcode & 0x00F0) >> 4
+    kk = opcode & 0x00FF
+    family = opcode >> 12
+
+    # Execute
     if opcode == 0x00E0:
-        return "CLS"
+        # CLS
+        display[:] = 0
+        regs[REG_DIRTY] = 1
     elif opcode == 0x00EE:
-        return "RET"
-    elif opcode & 0xF000 == 0x1000:
-        return f"JP {nnn:03X}"
-    elif opcode & 0xF000 == 0x2000:
-        return f"CALL {nnn:03X}"
-    elif opcode & 0xF000 == 0x3000:
-        return f"SE V{x:X}, {kk:02X}"
-    elif opcode & 0xF000 == 0x4000:
-        return f"SNE V{x:X}, {kk:02X}"
-    elif opcode & 0xF000 == 0x5000 and n == 0:
-        return f"SE V{x:X}, V{y:X}"
-    elif opcode & 0xF000 == 0x6000:
-        return f"LD V{x:X}, {kk:02X}"
-    elif opcode & 0xF000 == 0x7000:
-        return f"ADD V{x:X}, {kk:02X}"
-    elif opcode & 0xF000 == 0x8000:
-        if n == 0x0: return f"LD V{x:X}, V{y:X}"
-        if n == 0x1: return f"OR V{x:X}, V{y:X}"
-        if n == 0x2: return f"AND V{x:X}, V{y:X}"
-        if n == 0x3: return f"XOR V{x:X}, V{y:X}"
-        if n == 0x4: return f"ADD V{x:X}, V{y:X}"
-        if n == 0x5: return f"SUB V{x:X}, V{y:X}"
-        if n == 0x6: return f"SHR V{x:X}"
-        if n == 0x7: return f"SUBN V{x:X}, V{y:X}"
-        if n == 0xE: return f"SHL V{x:X}"
-    elif opcode & 0xF000 == 0x9000 and n == 0:
-        return f"SNE V{x:X}, V{y:X}"
-    elif opcode & 0xF000 == 0xA000:
-        return f"LD I, {nnn:03X}"
-    elif opcode & 0xF000 == 0xB000:
-        return f"JP V0, {nnn:03X}"
-    elif opcode & 0xF000 == 0xC000:
-        return f"RND V{x:X}, {kk:02X}"
-    elif opcode & 0xF000 == 0xD000:
-        return f"DRW V{x:X}, V{y:X}, {n:X}"
-    elif opcode & 0xF000 == 0xE000:
-        if kk == 0x9E: return f"SKP V{x:X}"
-        if kk == 0xA1: return f"SKNP V{x:X}"
-    elif opcode & 0xF000 == 0xF000:
-        if kk == 0x07: return f"LD V{x:X}, DT"
-        if kk == 0x0A: return f"LD V{x:X}, K"
-        if kk == 0x15: return f"LD DT, V{x:X}"
-        if kk == 0x18: return f"LD ST, V{x:X}"
-        if kk == 0x1E: return f"ADD I, V{x:X}"
-        if kk == 0x29: return f"LD F, V{x:X}"
-        if kk == 0x33: return f"LD B, V{x:X}"
-        if kk == 0x55: return f"LD [I], V0-V{x:X}"
-        if kk == 0x65: return f"LD V0-V{x:X}, [I]"
-    return f"UNKNOWN {opcode:04X}"
+        # RET
+        if sp == 0:
+            raise Exception("Stack underflow")
+        sp -= 1
+        pc = stack[sp]
+    elif family == 0x0:
+        # Ignored
+        pass
+    elif family == 0x1:
+        # JP addr
+        pc = nnn
+    elif family == 0x2:
+        # CALL addr
+        if sp == stack.shape[0]:
+            raise Exception("Stack overflow")
+        stack[sp] = pc
+        sp += 1
+        pc = nnn
+    elif family == 0x3:
+        # SE Vx, byte
+        if V[x] == kk:
+            pc += 2
+    elif family == 0x4:
+        # SNE Vx, byte
+        if V[x] != kk:
+            pc += 2
+    elif family == 0x5:
+        # SE Vx, Vy
+        if n == 0 and V[x] == V[y]:
+            pc += 2
+    elif family == 0x6:
+        # LD Vx, byte
+        V[x] = kk
+    elif family == 0x7:
+        # ADD Vx, byte
+        V[x] = (int(V[x]) + kk) & 0xFF
+    elif family == 0x8:
+        # Same register access order as Chip8.cycle, VF is written before Vx
+        # and Vy are read back, which matters when x or y is F
+        if n == 0x0:
+            # LD Vx, Vy
+            V[x] = V[y]
+        elif n == 0x1:
+            # OR Vx, Vy
+            V[x] |= V[y]
+        elif n == 0x2:
+            # AND Vx, Vy
+            V[x] &= V[y]
+        elif n == 0x3:
+            # XOR Vx, Vy
+            V[x] ^= V[y]
+        elif n == 0x4:
+            # ADD Vx, Vy
+            result = int(V[x]) + int(V[y])
+            V[0xF] = 1 if result > 0xFF else 0
+            V[x] = result & 0xFF
+        elif n == 0x5:
+            # SUB Vx, Vy
+            V[0xF] = 1 if V[x] > V[y] else 0
+            V[x] = (int(V[x]) - int(V[y])) & 0xFF
+        elif n == 0x6:
+            # SHR Vx {, Vy}
+            V[0xF] = V[x] & 0x1
+            V[x] = int(V[x]) >> 1
+        elif n == 0x7:
+            # SUBN Vx, Vy
+            V[0xF] = 1 if V[y] > V[x] else 0
+            V[x] = (int(V[y]) - int(V[x])) & 0xFF
+        elif n == 0xE:
+            # SHL Vx {, Vy}
+            V[0xF] = (V[x] & 0x80) >> 7
+            V[x] = (int(V[x]) << 1) & 0xFF
+    elif family == 0x9:
+        # SNE Vx, Vy
+        if n == 0 and V[x] != V[y]:
+            pc += 2
+    elif family == 0xA:
+        # LD I, addr
+        I = nnn
+    elif family == 0xB:
+        # JP V0, addr
+        pc = nnn + int(V[0])
+    elif family == 0xC:
+        # RND Vx, byte
+        V[x] = np.random.randint(0, 256) & kk
+    elif family == 0xD:
+        # DRW Vx, Vy, nibble
+        vx = int(V[x]) % 64
+        vy = int(V[y])
+        V[0xF] = 0
+        regs[REG_DIRTY] = 1
+        for row in range(n):
+            bits = np.uint64(memory[I + row]) << np.uint64(56)
+            sprite = bits >> np.uint64(vx)
+            if vx != 0:
+                # Pixels past the right edge wrap around to the left
+                sprite |= bits << np.uint64(64 - vx)
+            py = (vy + row) % 32
+            if display[py] & sprite:
+                V[0xF] = 1
+            display[py] ^= sprite
+    elif family == 0xE:
+        if kk == 0x9E:
+            # SKP Vx
+            if keys[V[x]] == 1:
+                pc += 2
+        elif kk == 0xA1:
+            # SKNP Vx
+            if keys[V[x]] == 0:
+                pc += 2
+    elif family == 0xF:
+        if kk == 0x07:
+            # LD Vx, DT
+            V[x] = regs[REG_DT]
+        elif kk == 0x0A:
+            # LD Vx, K
+            pressed = -1
+            for i in range(16):
+                if keys[i]:
+                    pressed = i
+                    break
+            if pressed == -1:
+                pc -= 2 # repeat this instruction until key pressed
+            else:
+                V[x] = pressed
+        elif kk == 0x15:
+            # LD DT, Vx
+            regs[REG_DT] = V[x]
+        elif kk == 0x18:
+            # LD ST, Vx
+            regs[REG_ST] = V[x]
+        elif kk == 0x1E:
+            # ADD I, Vx
+            I = (I + int(V[x])) & 0xFFF
+        elif kk == 0x29:
+            # LD F, Vx (sprite addr for digit)
+            I = int(V[x]) * 5
+        elif kk == 0x33:
+            # LD B, Vx (BCD)
+            value = int(V[x])
+            memory[I]     = value // 100
+            memory[I + 1] = (value // 10) % 10
+            memory[I + 2] = value % 10
+        elif kk == 0x55:
+            # LD [I], V0..Vx
+            memory[I:I + x + 1] = V[:x + 1]
+        elif kk == 0x65:
+            # LD V0..Vx, [I]
+            V[:x + 1] = memory[I:I + x + 1]
+
+    regs[REG_PC] = pc
+    regs[REG_I] = I
+    regs[REG_SP] = sp
+
+def _run_cycles(memory, V, display, keys, stack, regs, cycles):
+    for _ in range(cycles):
+        _cycle(memory, V, display, keys, stack, regs)
+
+if njit is not None:
+    # cache=True keeps the compiled kernel on disk between runs, boundscheck
+    # makes a bad address in a ROM raise IndexError like the Python path does
+    _cycle = njit(cache=True, boundscheck=True)(_cycle)
+    _run_cycles = njit(cache=True, boundscheck=True)(_run_cycles)
+
+# Built-in 4x5 hex digit sprites, loaded at address 0
+FONTSET = np.array([
+    0xF0,0x90,0x90,0x90,0xF0, # 0
+    0x20,0x60,0x20,0x20,0x70, # 1
+    0xF0,0x10,0xF0,0x80,0xF0, # 2
+    0xF0,0x10,0xF0,0x10,0xF0, # 3
+    0x90,0x90,0xF0,0x10,0x10, # 4
+    0xF0,0x80,0xF0,0x10,0xF0, # 5
+    0xF0,0x80,0xF0,0x90,0xF0, # 6
+    0xF0,0x10,0x20,0x40,0x40, # 7
+    0xF0,0x90,0xF0,0x90,0xF0, # 8
+    0xF0,0x90,0xF0,0x10,0xF0, # 9
+    0xF0,0x90,0xF0,0x90,0x90, # A
+    0xE0,0x90,0xE0,0x90,0xE0, # B
+    0xF0,0x80,0x80,0x80,0xF0, # C
+    0xE0,0x90,0x90,0x90,0xE0, # D
+    0xF0,0x80,0xF0,0x80,0xF0, # E
+    0xF0,0x80,0xF0,0x80,0x80  # F
+], dtype=np.uint8)
 
 # Chip-8 core
 class Chip8:
     def __init__(self):
         # 4 kb of memory
-        self.memory = [0] * MEMORY_SIZE
+        self.memory = np.zeros(MEMORY_SIZE, dtype=np.uint8)
 
         # Registers
-        self.V = [0] * 16
+        self.V = np.zeros(16, dtype=np.uint8)
 
         # Index register and program counter
         self.I = 0
         self.pc = 0x200 # Starts at 512
         
-        # Stores return addresses for subroutines
-        self.stack = []
+        # Stores return addresses for subroutines, sp is the next free slot
+        self.stack = np.zeros(STACK_SIZE, dtype=np.uint16)
+        self.sp = 0
         
         # Timers
         self.delay_timer = 0
         self.sound_timer = 0
         
-        # 64x32 Monochrome display
-        self.display = [[0] * 64 for _ in range(32)]
+        # 64x32 Monochrome display, packed one row per word
+        self.display = np.zeros(32, dtype=np.uint64)
+        # Set by CLS and DRW, cleared by whoever redraws the screen. Starts set
+        # so a freshly loaded ROM gets its blank screen drawn
+        self.display_dirty = True
 
         # Chip-8 has 16 keys
-        self.keys = [0] * 16
+        self.keys = np.zeros(16, dtype=np.uint8)
         
         # Load fontset to memory
-        fontset = [
-            0xF0,0x90,0x90,0x90,0xF0, # 0
-            0x20,0x60,0x20,0x20,0x70, # 1
-            0xF0,0x10,0xF0,0x80,0xF0, # 2
-            0xF0,0x10,0xF0,0x10,0xF0, # 3
-            0x90,0x90,0xF0,0x10,0x10, # 4
-            0xF0,0x80,0xF0,0x10,0xF0, # 5
-            0xF0,0x80,0xF0,0x90,0xF0, # 6
-            0xF0,0x10,0x20,0x40,0x40, # 7
-            0xF0,0x90,0xF0,0x90,0xF0, # 8
-            0xF0,0x90,0xF0,0x10,0xF0, # 9
-            0xF0,0x90,0xF0,0x90,0x90, # A
-            0xE0,0x90,0xE0,0x90,0xE0, # B
-            0xF0,0x80,0x80,0x80,0xF0, # C
-            0xE0,0x90,0x90,0x90,0xE0, # D
-            0xF0,0x80,0xF0,0x80,0xF0, # E
-            0xF0,0x80,0xF0,0x80,0x80  # F
+        self.memory[:len(FONTSET)] = FONTSET
+
+        # Opcode handlers indexed by the high nibble, and by n or kk for the
+        # families that pack several instructions under one nibble
+        self._dispatch = [
+            self._op_0, self._op_1, self._op_2, self._op_3,
+            self._op_4, self._op_5, self._op_6, self._op_7,
+            self._op_8, self._op_9, self._op_A, self._op_B,
+            self._op_C, self._op_D, self._op_E, self._op_F,
         ]
-        for i in range(len(fontset)):
-            self.memory[i] = fontset[i]
+        self._ops_8 = {
+            0x0: self._op_8_ld,
+            0x1: self._op_8_or,
+            0x2: self._op_8_and,
+            0x3: self._op_8_xor,
+            0x4: self._op_8_add,
+            0x5: self._op_8_sub,
+            0x6: self._op_8_shr,
+            0x7: self._op_8_subn,
+            0xE: self._op_8_shl,
+        }
+        self._ops_E = {
+            0x9E: self._op_E_skp,
+            0xA1: self._op_E_sknp,
+        }
+        self._ops_F = {
+            0x07: self._op_F_ld_vx_dt,
+            0x0A: self._op_F_ld_vx_k,
+            0x15: self._op_F_ld_dt_vx,
+            0x18: self._op_F_ld_st_vx,
+            0x1E: self._op_F_add_i_vx,
+            0x29: self._op_F_ld_f_vx,
+            0x33: self._op_F_ld_b_vx,
+            0x55: self._op_F_ld_i_vx,
+            0x65: self._op_F_ld_vx_i,
+        }
     
     def load_rom(self, path):
         with open(path, "rb") as f:
             rom = f.read()
-        for i, byte in enumerate(rom):
-            self.memory[0x200 + i] = byte
+        if len(rom) > MEMORY_SIZE - 0x200:
+            raise Exception("ROM file is too large for Chip-8 memory")
+        self.memory[0x200:0x200 + len(rom)] = np.frombuffer(rom, dtype=np.uint8)
+
+        if njit is not None:
+            # Compile the JIT kernel now instead of on the first frame
+            self.run(0)
+
+    def run(self, cycles):
+        if njit is None:
+            for _ in range(cycles):
+                self.cycle()
+            return
+
+        # The kernel works on arrays only, so pack the scalar state before
+        # crossing into it and unpack it afterwards
+        regs = np.array([self.pc, self.I, self.sp, self.delay_timer, self.sound_timer, 0], dtype=np.int64)
+        _run_cycles(self.memory, self.V, self.display, self.keys, self.stack, regs, cycles)
+        self.pc = int(regs[REG_PC])
+        self.I = int(regs[REG_I])
+        self.sp = int(regs[REG_SP])
+        self.delay_timer = int(regs[REG_DT])
+        self.sound_timer = int(regs[REG_ST])
+        if regs[REG_DIRTY]:
+            self.display_dirty = True
 
     def cycle(self):
         # Fetch
-        opcode = (self.memory[self.pc] << 8) | self.memory[self.pc + 1]
+        opcode = (int(self.memory[self.pc]) << 8) | int(self.memory[self.pc + 1])
         self.pc += 2 # Since one Chip-8 instruction is 2 bytes
 
-        # Decode
-        nnn = opcode & 0x0FFF # Address
-        n = opcode & 0x000F # Least significant nibble
-        x = (opcode & 0x0F00) >> 8 # Register X
-        y = (opcode & 0x00F0) >> 4 # Register Y
-        kk = opcode & 0x00FF # The byte
+        # Decode and execute, each handler extracts only the fields it uses:
+        # nnn (address), n (low nibble), x and y (registers), kk (byte)
+        self._dispatch[opcode >> 12](opcode)
 
-        # Execute
+    def _op_0(self, opcode):
         if opcode == 0x00E0:
             # CLS
-            self.display = [[0] * 64 for _ in range(32)]
+            self.display[:] = 0
+            self.display_dirty = True
         elif opcode == 0x00EE:
             # RET
-            self.pc = self.stack.pop()
-        elif opcode & 0xF000 == 0x0000:
-            # Ignored
-            pass
-        elif opcode & 0xF000 == 0x1000:
-            # JP addr
-            self.pc = nnn
-        elif opcode & 0xF000 == 0x2000:
-            # CALL addr
-            self.stack.append(self.pc)
-            self.pc = nnn
-        elif opcode & 0xF000 == 0x3000:
-            # SE Vx, byte
-            if self.V[x] == kk:
-                self.pc += 2
-        elif opcode & 0xF000 == 0x4000:
-            # SNE Vx, byte
-            if self.V[x] != kk:
-                self.pc += 2
-        elif opcode & 0xF000 == 0x5000:
-            # SE Vx, Vy
-            if n == 0 and self.V[x] == self.V[y]:
-                self.pc += 2
-        elif opcode & 0xF000 == 0x6000:
-            # LD Vx, byte
-            self.V[x] = kk
-        elif opcode & 0xF000 == 0x7000:
-            # ADD Vx, byte
-            self.V[x] = (self.V[x] + kk) & 0xFF
-        elif opcode & 0xF000 == 0x8000:
-            if n == 0x0:
-                # LD Vx, Vy
-                self.V[x] = self.V[y]
-            elif n == 0x1:
-                # OR Vx, Vy
-                self.V[x] |= self.V[y]
-            elif n == 0x2:
-                # AND Vx, Vy
-                self.V[x] &= self.V[y]
-            elif n == 0x3:
-                # XOR Vx, Vy
-                self.V[x] ^= self.V[y]
-            elif n == 0x4:
-                # ADD Vx, Vy
-                result = self.V[x] + self.V[y]
-                self.V[0xF] = 1 if result > 0xFF else 0
-                self.V[x] = result & 0xFF
-            elif n == 0x5:
-                # SUB Vx, Vy
-                self.V[0xF] = 1 if self.V[x] > self.V[y] else 0
-                self.V[x] = (self.V[x] - self.V[y]) & 0xFF
-            elif n == 0x6:
-                # SHR Vx {, Vy}
-                self.V[0xF] = self.V[x] & 0x1
-                self.V[x] >>= 1
-            elif n == 0x7:
-                # SUBN Vx, Vy
-                self.V[0xF] = 1 if self.V[y] > self.V[x] else 0
-                self.V[x] = (self.V[y] - self.V[x]) & 0xFF
-            elif n == 0xE:
-                # SHL Vx {, Vy}
-                self.V[0xF] = (self.V[x] & 0x80) >> 7
-                self.V[x] = (self.V[x] << 1) & 0xFF
-        elif opcode & 0xF000 == 0x9000:
-            # SNE Vx, Vy
-            if n == 0 and self.V[x] != self.V[y]:
-                self.pc += 2
-        elif opcode & 0xF000 == 0xA000:
-            # LD I, addr
-            self.I = nnn
-        elif opcode & 0xF000 == 0xB000:
-            # JP V0, addr
-            self.pc = nnn + self.V[0]
-        elif opcode & 0xF000 == 0xC000:
-            # RND Vx, byte
-            import random
-            self.V[x] = random.randint(0, 255) & kk
-        elif opcode & 0xF000 == 0xD000:
-            # DRW Vx, Vy, nibble
-            vx, vy = self.V[x], self.V[y]
-            self.V[0xF] = 0
-            for row in range(n):
-                sprite = self.memory[self.I + row]
-                for col in range(8):
-                    if (sprite & (0x80 >> col)) != 0:
-                        px = (vx + col) % 64
-                        py = (vy + row) % 32
-                        if self.display[py][px] == 1:
-                            self.V[0xF] = 1
-                        self.display[py][px] ^= 1
-        elif opcode & 0xF000 == 0xE000:
-            if kk == 0x9E:
-                # SKP Vx
-                if self.keys[self.V[x]] == 1:
-                    self.pc += 2
-            elif kk == 0xA1:
-                # SKNP Vx
-                if self.keys[self.V[x]] == 0:
-                    self.pc += 2
-        elif opcode & 0xF000 == 0xF000:
-            if kk == 0x07:
-                # LD Vx, DT
-                self.V[x] = self.delay_timer
-            elif kk == 0x0A:
-                # LD Vx, K
-                pressed = None
-                for i in range(16):
-                    if self.keys[i]:
-                        pressed = i
-                        break
-                if pressed is None:
-                    self.pc -= 2 # repeat this instruction until key pressed
-                else:
-                    self.V[x] = pressed
-            elif kk == 0x15:
-                # LD DT, Vx
-                self.delay_timer = self.V[x]
-            elif kk == 0x18:
-                # LD ST, Vx
-                self.sound_timer = self.V[x]
-            elif kk == 0x1E:
-                # ADD I, Vx
-                self.I = (self.I + self.V[x]) & 0xFFF
-            elif kk == 0x29:
-                # LD F, Vx (sprite addr for digit)
-                self.I = self.V[x] * 5
-            elif kk == 0x33:
-                # LD B, Vx (BCD)
-                value = self.V[x]
-                self.memory[self.I]     = value // 100
-                self.memory[self.I + 1] = (value // 10) % 10
-                self.memory[self.I + 2] = value % 10
-            elif kk == 0x55:
-                # LD [I], V0..Vx
-                for i in range(x + 1):
-                    self.memory[self.I + i] = self.V[i]
-            elif kk == 0x65:
-                # LD V0..Vx, [I]
-                for i in range(x + 1):
-                    self.V[i] = self.memory[self.I + i]
-
+            if self.sp == 0:
+                raise Exception("Stack underflow")
+            self.sp -= 1
+            self.pc = int(self.stack[self.sp])
+        # Anything else (SYS addr) is ignored
+
+    def _op_1(self, opcode):
+        nnn = opcode & 0x0FFF
+        # JP addr
+        self.pc = nnn
+
+    def _op_2(self, opcode):
+        nnn = opcode & 0x0FFF
+        # CALL addr
+        if self.sp == STACK_SIZE:
+            raise Exception("Stack overflow")
+        self.stack[self.sp] = self.pc
+        self.sp += 1
+        self.pc = nnn
+
+    def _op_3(self, opcode):
+        x = (opcode & 0x0F00) >> 8
+        kk = opcode & 0x00FF
+        # SE Vx, byte
+        if self.V[x] == kk:
+            self.pc += 2
+
+    def _op_4(self, opcode):
+        x = (opcode & 0x0F00) >> 8
+        kk = opcode & 0x00FF
+        # SNE Vx, byte
+        if self.V[x] != kk:
+            self.pc += 2
+
+    def _op_5(self, opcode):
+        x = (opcode & 0x0F00) >> 8
+        y = (opcode & 0x00F0) >> 4
+        n = opcode & 0x000F
+        # SE Vx, Vy
+        if n == 0 and self.V[x] == self.V[y]:
+            self.pc += 2
+
+    def _op_6(self, opcode):
+        x = (opcode & 0x0F00) >> 8
+        kk = opcode & 0x00FF
+        # LD Vx, byte
+        self.V[x] = kk
+
+    def _op_7(self, opcode):
+        x = (opcode & 0x0F00) >> 8
+        kk = opcode & 0x00FF
+        # ADD Vx, byte
+        self.V[x] = (int(self.V[x]) + kk) & 0xFF
+
+    def _op_8(self, opcode):
+        x = (opcode & 0x0F00) >> 8
+        y = (opcode & 0x00F0) >> 4
+        n = opcode & 0x000F
+        handler = self._ops_8.get(n)
+        if handler is not None:
+            handler(x, y)
+
+    def _op_8_ld(self, x, y):
+        # LD Vx, Vy
+        self.V[x] = self.V[y]
+
+    def _op_8_or(self, x, y):
+        # OR Vx, Vy
+        self.V[x] |= self.V[y]
+
+    def _op_8_and(self, x, y):
+        # AND Vx, Vy
+        self.V[x] &= self.V[y]
+
+    def _op_8_xor(self, x, y):
+        # XOR Vx, Vy
+        self.V[x] ^= self.V[y]
+
+    def _op_8_add(self, x, y):
+        # ADD Vx, Vy
+        result = int(self.V[x]) + int(self.V[y])
+        self.V[0xF] = 1 if result > 0xFF else 0
+        self.V[x] = result & 0xFF
+
+    def _op_8_sub(self, x, y):
+        # SUB Vx, Vy
+        self.V[0xF] = 1 if self.V[x] > self.V[y] else 0
+        self.V[x] = (int(self.V[x]) - int(self.V[y])) & 0xFF
+
+    def _op_8_shr(self, x, y):
+        # SHR Vx {, Vy}
+        self.V[0xF] = self.V[x] & 0x1
+        self.V[x] >>= 1
+
+    def _op_8_subn(self, x, y):
+        # SUBN Vx, Vy
+        self.V[0xF] = 1 if self.V[y] > self.V[x] else 0
+        self.V[x] = (int(self.V[y]) - int(self.V[x])) & 0xFF
+
+    def _op_8_shl(self, x, y):
+        # SHL Vx {, Vy}
+        self.V[0xF] = (self.V[x] & 0x80) >> 7
+        self.V[x] = (int(self.V[x]) << 1) & 0xFF
+
+    def _op_9(self, opcode):
+        x = (opcode & 0x0F00) >> 8
+        y = (opcode & 0x00F0) >> 4
+        n = opcode & 0x000F
+        # SNE Vx, Vy
+        if n == 0 and self.V[x] != self.V[y]:
+            self.pc += 2
+
+    def _op_A(self, opcode):
+        nnn = opcode & 0x0FFF
+        # LD I, addr
+        self.I = nnn
+
+    def _op_B(self, opcode):
+        nnn = opcode & 0x0FFF
+        # JP V0, addr
+        self.pc = nnn + int(self.V[0])
+
+    def _op_C(self, opcode):
+        x = (opcode & 0x0F00) >> 8
+        kk = opcode & 0x00FF
+        # RND Vx, byte
+        self.V[x] = getrandbits(8) & kk
+
+    def _op_D(self, opcode):
+        x = (opcode & 0x0F00) >> 8
+        y = (opcode & 0x00F0) >> 4
+        n = opcode & 0x000F
+        # DRW Vx, Vy, nibble
+        vx, vy = int(self.V[x]) % 64, int(self.V[y])
+        self.V[0xF] = 0
+        for row in range(n):
+            # Rotate the sprite byte into place so pixels past the right edge
+            # wrap around to the left, then XOR the whole row at once
+            bits = int(self.memory[self.I + row]) << 56
+            sprite = ((bits >> vx) | (bits << (64 - vx))) & ROW_MASK
+            py = (vy + row) % 32
+            old = int(self.display[py])
+            if old & sprite:
+                self.V[0xF] = 1
+            self.display[py] = old ^ sprite
+        # Only once every row is written, the Tk thread may clear the flag and
+        # snapshot the display at any point in between
+        self.display_dirty = True
+
+    def _op_E(self, opcode):
+        x = (opcode & 0x0F00) >> 8
+        kk = opcode & 0x00FF
+        handler = self._ops_E.get(kk)
+        if handler is not None:
+            handler(x)
+
+    def _op_E_skp(self, x):
+        # SKP Vx
+        if self.keys[self.V[x]] == 1:
+            self.pc += 2
+
+    def _op_E_sknp(self, x):
+        # SKNP Vx
+        if self.keys[self.V[x]] == 0:
+            self.pc += 2
+
+    def _op_F(self, opcode):
+        x = (opcode & 0x0F00) >> 8
+        kk = opcode & 0x00FF
+        handler = self._ops_F.get(kk)
+        if handler is not None:
+            handler(x)
+
+    def _op_F_ld_vx_dt(self, x):
+        # LD Vx, DT
+        self.V[x] = self.delay_timer
+
+    def _op_F_ld_vx_k(self, x):
+        # LD Vx, K
+        pressed = None
+        for i in range(16):
+            if self.keys[i]:
+                pressed = i
+                break
+        if pressed is None:
+            self.pc -= 2 # repeat this instruction until key pressed
         else:
-            raise Exception(f"Unknown opcode {opcode:04X}")
+            self.V[x] = pressed
+
+    def _op_F_ld_dt_vx(self, x):
+        # LD DT, Vx
+        self.delay_timer = int(self.V[x])
+
+    def _op_F_ld_st_vx(self, x):
+        # LD ST, Vx
+        self.sound_timer = int(self.V[x])
+
+    def _op_F_add_i_vx(self, x):
+        # ADD I, Vx
+        self.I = (self.I + int(self.V[x])) & 0xFFF
+
+    def _op_F_ld_f_vx(self, x):
+        # LD F, Vx (sprite addr for digit)
+        self.I = int(self.V[x]) * 5
+
+    def _op_F_ld_b_vx(self, x):
+        # LD B, Vx (BCD)
+        value = int(self.V[x])
+        self.memory[self.I]     = value // 100
+        self.memory[self.I + 1] = (value // 10) % 10
+        self.memory[self.I + 2] = value % 10
+
+    def _op_F_ld_i_vx(self, x):
+        # LD [I], V0..Vx
+        self.memory[self.I:self.I + x + 1] = self.V[:x + 1]
+
+    def _op_F_ld_vx_i(self, x):
+        # LD V0..Vx, [I]
+        self.V[:x + 1] = self.memory[self.I:self.I + x + 1]
+
+def unpack_display(display):
+    # Big-endian bytes put bit 63 (pixel 0) first, unpackbits expands them
+    # into a 32x64 array of 0/1 pixels
+    return np.unpackbits(display.astype(">u8").view(np.uint8).reshape(-1, 8), axis=1)
 
 # Tkinter screen component
 class Screen:
@@ -287,25 +682,55 @@ class Screen:
         self.scale=scale
         self.width=64
         self.height=32
-        self.fg_color=(255,255,255)
-        self.bg_color=(0,0,0)
-        self.image=Image.new("RGB",(self.width,self.height),"black")
-        self.photo=ImageTk.PhotoImage(self.image.resize((self.width*scale,self.height*scale),Image.NEAREST))
+        # Tk color per pixel value, background first
+        self._palette=["#000000","#ffffff"]
+        # Packed copy of what is currently shown, so draw only repaints what changed
+        self._prev=np.zeros(self.height,dtype=np.uint64)
+        # Changed pixels are put into an unscaled source image, which Tk then
+        # zooms in place into the image shown by the label
+        self._src=PhotoImage(width=self.width,height=self.height)
+        self.photo=PhotoImage(width=self.width*scale,height=self.height*scale)
         self.label=ttk.Label(parent,image=self.photo)
         self.label.pack()
+        self._repaint()
 
     def draw(self):
-        pixels=self.image.load()
-        for y in range(self.height):
-            for x in range(self.width):
-                pixels[x,y]=self.fg_color if self.chip8.display[y][x] else self.bg_color
-        self.photo=ImageTk.PhotoImage(self.image.resize((self.width*self.scale,self.height*self.scale),Image.NEAREST))
-        self.label.config(image=self.photo)
-        self.label.image=self.photo
+        # The CPU thread keeps running while Tk paints, so work from one
+        # snapshot, otherwise a DRW landing mid-draw would be copied into
+        # _prev without ever being painted
+        display=self.chip8.display.copy()
+        changed=display^self._prev
+        rows=np.flatnonzero(changed)
+        if rows.size==0:
+            return
+        pixels=unpack_display(display)
+        # Put the span between the first and last changed pixel of each row
+        for y in rows.tolist():
+            diff=int(changed[y])
+            x0=64-diff.bit_length()
+            x1=65-(diff&-diff).bit_length()
+            self._src.put(self._row_data(pixels[y,x0:x1]),to=(x0,y))
+        self._prev[:]=display
+        self._zoom(int(rows[0]),int(rows[-1])+1)
 
     def set_colors(self,fg,bg):
-        self.fg_color=fg
-        self.bg_color=bg
+        self._palette=["#%02x%02x%02x"%tuple(bg),"#%02x%02x%02x"%tuple(fg)]
+        self._repaint()
+
+    def _repaint(self):
+        pixels=unpack_display(self._prev)
+        self._src.put(" ".join(self._row_data(row) for row in pixels))
+        self._zoom(0,self.height)
+
+    def _row_data(self,row):
+        return "{"+" ".join([self._palette[p] for p in row.tolist()])+"}"
+
+    def _zoom(self,y0,y1):
+        # Scale rows y0..y1 of the source into the same rows of the shown image
+        self.photo.tk.call(str(self.photo),"copy",str(self._src),
+                           "-from",0,y0,self.width,y1,
+                           "-to",0,y0*self.scale,
+                           "-zoom",self.scale,self.scale)
 
 # Main app
 class App:
@@ -338,17 +763,31 @@ class App:
         ttk.Button(self.control_frame, text="Key Bindings", command=self.edit_key_bindings).grid(row=0, column=4, padx=5)
         self.disassemble_button = ttk.Button(self.control_frame, text="Disassemble", command=self.disassemble, state=DISABLED)
         self.disassemble_button.grid(row=0, column=5, padx=5)
+
+        # The CPU runs on its own thread so slow GUI events don't stall it,
+        # the Tk loop only redraws when a frame's worth of cycles has run
+        self._frame_ready = threading.Event()
+        threading.Thread(target=self._cpu_thread, daemon=True).start()
+        self._next_frame = time.perf_counter()
         self.update_loop()
 
+    def _chip8_key(self,event):
+        # Keysym first, the same name wait_for_key stores bindings under, then
+        # the typed char so keypad keys (KP_1 -> "1") still hit the defaults
+        key=self.keymap.get(event.keysym.lower())
+        if key is None and event.char:
+            key=self.keymap.get(event.char.lower())
+        return key
+
     def key_press(self,event):
         if self.chip8:
-            key=event.char.lower()
-            if key in self.keymap: self.chip8.keys[self.keymap[key]]=1
+            key=self._chip8_key(event)
+            if key is not None: self.chip8.keys[key]=1
 
     def key_release(self,event):
         if self.chip8:
-            key=event.char.lower()
-            if key in self.keymap: self.chip8.keys[self.keymap[key]]=0
+            key=self._chip8_key(event)
+            if key is not None: self.chip8.keys[key]=0
 
     def load_rom(self):
         filepath=filedialog.askopenfilename(filetypes=[("Chip-8 ROM","*.ch8")])
@@ -360,8 +799,11 @@ class App:
                 messagebox.showerror("Error", "ROM file is too large for Chip-8 memory!")
                 return
 
-            self.chip8=Chip8()
-            self.chip8.load_rom(filepath)
+            # Load before publishing, the CPU thread picks up self.chip8 as
+            # soon as it is assigned
+            chip8=Chip8()
+            chip8.load_rom(filepath)
+            self.chip8=chip8
             if self.screen is None:
                 self.screen=Screen(self.screen_frame,self.chip8,scale=10)
             else:
@@ -419,12 +861,18 @@ class App:
         asm_viewer = ttk.Text(win, wrap="none")
         asm_viewer.pack(fill="both", expand=True)
         
-        pc = 0x200
-        while pc < MEMORY_SIZE - 1:
-            opcode = (self.chip8.memory[pc] << 8) | self.chip8.memory[pc+1]
-            asm = disassemble(opcode)
-            asm_viewer.insert("end", f"{pc:03X}: {opcode:004X}   {asm}\n")
-            pc += 2
+        # Read the program area as big-endian 16-bit opcodes, stopping at the
+        # last non-zero byte so the empty memory after the ROM isn't listed,
+        # and insert the whole listing at once
+        program = self.chip8.memory[0x200:]
+        used = np.flatnonzero(program)
+        end = (used[-1] // 2 + 1) * 2 if used.size else 0
+        opcodes = program[:end].view(">u2").tolist()
+        listing = "".join(
+            f"{0x200 + 2 * i:03X}: {opcode:004X}   {disassemble(opcode)}\n"
+            for i, opcode in enumerate(opcodes)
+        )
+        asm_viewer.insert("end", listing)
         asm_viewer.config(state="disabled")
 
     def get_key_for_chip8(self, chip8_index):
@@ -443,12 +891,41 @@ class App:
 
         bind_id = window.bind("<KeyPress>", on_press)
     
+    def _cpu_thread(self):
+        next_frame = time.perf_counter()
+        while True:
+            chip8 = self.chip8
+            if chip8 and self.running:
+                chip8.run(CYCLES_PER_FRAME)
+                self._frame_ready.set()
+            next_frame += FRAME_TIME
+            delay = next_frame - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Fell behind, start counting again from now instead of
+                # running a burst of frames to catch up
+                next_frame = time.perf_counter()
+
     def update_loop(self):
-        if self.chip8 and self.running:
-            for _ in range(10):
-                self.chip8.cycle()
-            if self.screen: self.screen.draw()
-        self.root.after(16,self.update_loop)
+        if self._frame_ready.is_set():
+            self._frame_ready.clear()
+            # Clear the flag before drawing: draw paints a snapshot, and CLS
+            # and DRW only set the flag after their display writes are done,
+            # so anything that finishes after the snapshot sets it again and
+            # gets painted next frame
+            if self.screen and self.chip8.display_dirty:
+                self.chip8.display_dirty = False
+                self.screen.draw()
+
+        # Schedule against a fixed deadline so time spent drawing doesn't
+        # push every later frame back
+        self._next_frame += FRAME_TIME
+        delay = self._next_frame - time.perf_counter()
+        if delay < 0:
+            # Fell behind, start counting again from now
+            self._next_frame = time.perf_counter()
+        self.root.after(max(1, int(delay * 1000)), self.update_loop)
 
 if __name__=="__main__":
     root=ttk.Window(themename="darkly")